@@ -1,22 +1,30 @@
-from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, WebSocket, WebSocketDisconnect, HTTPException, Depends, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
 from starlette.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
-from pydantic import BaseModel, EmailStr, ConfigDict, Field
+from pydantic import BaseModel, EmailStr, ConfigDict, Field, PlainSerializer, TypeAdapter, ValidationError
+import asyncio
+import httpx
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
 import bcrypt
+from cachetools import TTLCache
 import jwt
 import os
-from typing import List, Dict, Optional
-import json
+from typing import Annotated, List, Dict, Optional, Set, Tuple
+import orjson
 import logging
 from pathlib import Path
 import uuid
 from datetime import datetime, timezone, timedelta
-import random
+import secrets
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -24,6 +32,11 @@ load_dotenv(ROOT_DIR / '.env')
 mongo_url = os.environ['MONGO_URL']
 YOUTUBE_API_KEY = os.environ.get('YOUTUBE_API_KEY', 'your-youtube-api-key')
 client = AsyncIOMotorClient(mongo_url)
+redis_client = Redis.from_url(os.environ.get('REDIS_URL', 'redis://localhost:6379'))
+youtube_client = httpx.AsyncClient(
+    base_url="https://www.googleapis.com/youtube/v3",
+    params={"key": YOUTUBE_API_KEY, "part": "snippet", "type": "video", "videoCategoryId": "10"}
+)
 db = client[os.environ['DB_NAME']]
 api_router = APIRouter(prefix="/api")
 security = HTTPBearer()
@@ -31,15 +44,40 @@ security = HTTPBearer()
 JWT_SECRET = os.environ.get('JWT_SECRET', 'jwt-secret')
 JWT_ALGORITHM = 'HS256'
 JWT_EXPIRATION_HOURS = 24
+YOUTUBE_CACHE_TTL_HOURS = 6
+YOUTUBE_TIMEOUT_SECONDS = 5
+PIN_CANDIDATES = 8
+auth_cache = TTLCache(maxsize=10_000, ttl=300)
+password_hasher = PasswordHasher(time_cost=2, memory_cost=64 * 1024, parallelism=2)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    await db.users.create_index("email", unique=True)
+    await db.rooms.create_index([("pin", 1), ("active", 1)])
+    await db.rooms.create_index("id", unique=True)
+    await db.rooms.create_index("dj_id")
+    await db.song_requests.create_index([("room_id", 1), ("created_at", 1)])
+    await db.song_requests.create_index("id", unique=True)
+    await db.yt_cache.create_index("expires_at", expireAfterSeconds=0)
+    await manager.pubsub.connect()
+    listener = asyncio.create_task(manager.listen())
     yield
+    # Stop everything that still uses the Redis connection before closing it
+    tasks = [listener, *manager.tasks, *coalescer.tasks]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await manager.pubsub.aclose()
+    await redis_client.aclose()
+    await youtube_client.aclose()
     client.close()
     print("Database client closed")
 
 app = FastAPI(lifespan=lifespan)
 
+# Keep isoformat()'s +00:00 suffix so stored created_at strings sort consistently
+IsoDatetime = Annotated[datetime, PlainSerializer(lambda value: value.isoformat(), when_used="json")]
+
 class VoteRequest(BaseModel):
     session_id: str
 
@@ -59,7 +97,7 @@ class SongRequest(BaseModel):
     votes: int = 0
     voted_by: List[str] = Field(default_factory=list) 
     status: str = "pending"
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: IsoDatetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class SongRequestCreate(BaseModel):
     youtube_video_id: str
@@ -76,14 +114,18 @@ class Room(BaseModel):
     dj_id: str
     dj_email: str
     active: bool = True
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: IsoDatetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     email: EmailStr
     password_hash: str
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: IsoDatetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+class CurrentUser(BaseModel):
+    id: str
+    email: str
 
 class UserRegister(BaseModel):
     email: EmailStr
@@ -93,34 +135,140 @@ class UserLogin(BaseModel):
     email: EmailStr
     password: str
 
+class WSMessage(BaseModel):
+    type: str
+    user: str = "Guest"
+
+ws_message_adapter = TypeAdapter(WSMessage)
+
 class ConnectionManager:
     def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+        self.active_connections: Dict[str, Set[WebSocket]] = {}
+        self.locks: Dict[str, asyncio.Lock] = {}
+        self.lock_users: Dict[str, int] = {}
+        self.pubsub = redis_client.pubsub()
+        self.outbox: Dict[str, asyncio.Queue] = {}
+        self.tasks: Set[asyncio.Task] = set()
+
+    @asynccontextmanager
+    async def _lock(self, room_pin: str):
+        lock = self.locks.setdefault(room_pin, asyncio.Lock())
+        self.lock_users[room_pin] = self.lock_users.get(room_pin, 0) + 1
+        try:
+            async with lock:
+                yield
+        finally:
+            # Drop the lock once nobody holds or waits for it
+            self.lock_users[room_pin] -= 1
+            if not self.lock_users[room_pin]:
+                del self.lock_users[room_pin]
+                del self.locks[room_pin]
 
     async def connect(self, websocket: WebSocket, room_pin: str):
         await websocket.accept()
-        if room_pin not in self.active_connections:
-            self.active_connections[room_pin] = []
-        self.active_connections[room_pin].append(websocket)
-
-    def disconnect(self, websocket: WebSocket, room_pin: str):
-        if room_pin in self.active_connections:
-            self.active_connections[room_pin].remove(websocket)
-            if not self.active_connections[room_pin]:
+        async with self._lock(room_pin):
+            if room_pin not in self.active_connections:
+                # First local listener in this room, start receiving its broadcasts
+                await self.pubsub.subscribe(f"room:{room_pin}")
+                self.active_connections[room_pin] = set()
+            self.active_connections[room_pin].add(websocket)
+
+    async def disconnect(self, websocket: WebSocket, room_pin: str):
+        async with self._lock(room_pin):
+            await self._remove(websocket, room_pin)
+
+    async def _remove(self, websocket: WebSocket, room_pin: str):
+        connections = self.active_connections.get(room_pin)
+        if connections is not None:
+            connections.discard(websocket)
+            if not connections:
                 del self.active_connections[room_pin]
+                await self.pubsub.unsubscribe(f"room:{room_pin}")
 
     async def broadcast(self, room_pin: str, message: dict):
-        if room_pin in self.active_connections:
-            for connection in self.active_connections[room_pin]:
-                try:
-                    await connection.send_json(message)
-                except:
-                    pass
+        # Serialize once and let every worker fan out to its own sockets
+        try:
+            await redis_client.publish(f"room:{room_pin}", orjson.dumps(message))
+        except RedisError:
+            logger.exception("Failed to publish broadcast to room %s", room_pin)
+
+    async def _send_local(self, room_pin: str, payload: str):
+        # Snapshot under the room lock, then send without holding it
+        async with self._lock(room_pin):
+            connections = tuple(self.active_connections.get(room_pin, ()))
+        if not connections:
+            return
+        results = await asyncio.gather(
+            *(connection.send_text(payload) for connection in connections),
+            return_exceptions=True
+        )
+        failed = [connection for connection, result in zip(connections, results) if isinstance(result, Exception)]
+        if failed:
+            async with self._lock(room_pin):
+                for connection in failed:
+                    await self._remove(connection, room_pin)
+
+    def _enqueue(self, room_pin: str, payload: str):
+        # One drain task per room keeps messages ordered within a room
+        # without a slow room holding up the others
+        queue = self.outbox.get(room_pin)
+        if queue is None:
+            queue = self.outbox[room_pin] = asyncio.Queue()
+            task = asyncio.create_task(self._drain(room_pin, queue))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+        queue.put_nowait(payload)
+
+    async def _drain(self, room_pin: str, queue: asyncio.Queue):
+        while not queue.empty():
+            payload = queue.get_nowait()
+            try:
+                await self._send_local(room_pin, payload)
+            except Exception:
+                logger.exception("Failed to deliver broadcast to room %s", room_pin)
+        del self.outbox[room_pin]
+
+    async def listen(self):
+        while True:
+            try:
+                message = await self.pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                if message:
+                    room_pin = message['channel'].decode('utf-8').removeprefix("room:")
+                    self._enqueue(room_pin, message['data'].decode('utf-8'))
+            except RedisError:
+                logger.exception("Redis pub/sub connection failed")
+                await asyncio.sleep(1)
+            except Exception:
+                logger.exception("Failed to handle pub/sub message")
 
 manager = ConnectionManager()
 
+class BroadcastCoalescer:
+    def __init__(self, manager: ConnectionManager, delay: float = 0.05):
+        self.manager = manager
+        self.delay = delay
+        self.pending: Dict[Tuple[str, str, str], dict] = {}
+        self.tasks: Set[asyncio.Task] = set()
+
+    def post(self, room_pin: str, key: str, message: dict):
+        pending_key = (room_pin, key, message['type'])
+        if pending_key not in self.pending:
+            asyncio.get_running_loop().call_later(self.delay, self._flush, pending_key)
+        # Only the latest message for a key is sent when the window closes
+        self.pending[pending_key] = message
+
+    def _flush(self, pending_key: Tuple[str, str, str]):
+        message = self.pending.pop(pending_key, None)
+        if message is None:
+            return
+        task = asyncio.create_task(self.manager.broadcast(pending_key[0], message))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+coalescer = BroadcastCoalescer(manager)
+
 def generate_room_pin() -> str:
-    return ''.join([str(random.randint(0, 9)) for _ in range(4)])
+    return f"{secrets.randbelow(10000):04d}"
 
 def create_jwt_token(user_id: str, email: str) -> str:
     expiration = datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRATION_HOURS)
@@ -131,11 +279,31 @@ def create_jwt_token(user_id: str, email: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def hash_password(password: str) -> str:
+    return await asyncio.to_thread(password_hasher.hash, password)
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+def _verify_argon2(password: str, hashed: str) -> bool:
+    try:
+        return password_hasher.verify(hashed, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+async def verify_password(password: str, hashed: str) -> bool:
+    if hashed.startswith('$argon2'):
+        return await asyncio.to_thread(_verify_argon2, password, hashed)
+    # Legacy bcrypt hashes are still accepted and upgraded on login
+    return await asyncio.to_thread(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
+
+def password_needs_rehash(hashed: str) -> bool:
+    if not hashed.startswith('$argon2'):
+        return True
+    return password_hasher.check_needs_rehash(hashed)
+
+async def rehash_password(user_id: str, password: str):
+    await db.users.update_one(
+        {"id": user_id},
+        {"$set": {"password_hash": await hash_password(password)}}
+    )
 
 def verify_jwt_token(token: str) -> dict:
     try:
@@ -148,30 +316,36 @@ def verify_jwt_token(token: str) -> dict:
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     token = credentials.credentials
+    cached = auth_cache.get(token)
+    if cached and cached[1] > datetime.now(timezone.utc).timestamp():
+        return cached[0]
+    
     payload = verify_jwt_token(token)
-    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0})
+    user = await db.users.find_one({"id": payload['user_id']}, {"_id": 0, "id": 1, "email": 1})
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return User(**user)
-
-def get_youtube_service():
-    return build('youtube', 'v3', developerKey=YOUTUBE_API_KEY, cache_discovery=False)
+    
+    current_user = CurrentUser(**user)
+    auth_cache[token] = (current_user, payload['exp'])
+    return current_user
 
 @api_router.post("/auth/register")
 async def register(user_data: UserRegister):
-    existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 0})
+    existing_user = await db.users.find_one({"email": user_data.email}, {"_id": 1})
 
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
     user = User(
         email=user_data.email,
-        password_hash=hash_password(user_data.password)
+        password_hash=await hash_password(user_data.password)
     )
     
-    doc = user.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
-    await db.users.insert_one(doc)
+    doc = user.model_dump(mode="json")
+    try:
+        await db.users.insert_one(doc)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=400, detail="Email already registered")
     
     token = create_jwt_token(user.id, user.email)
     
@@ -184,14 +358,17 @@ async def register(user_data: UserRegister):
     }
 
 @api_router.post("/auth/login")
-async def login(user_data: UserLogin):
+async def login(user_data: UserLogin, background_tasks: BackgroundTasks):
     user_doc = await db.users.find_one({"email": user_data.email}, {"_id": 0})
     if not user_doc:
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
-    if not verify_password(user_data.password, user_doc['password_hash']):
+    if not await verify_password(user_data.password, user_doc['password_hash']):
         raise HTTPException(status_code=401, detail="Invalid email or password")
     
+    if password_needs_rehash(user_doc['password_hash']):
+        background_tasks.add_task(rehash_password, user_doc['id'], user_data.password)
+    
     token = create_jwt_token(user_doc['id'], user_doc['email'])
     
     return {
@@ -204,36 +381,36 @@ async def login(user_data: UserLogin):
 
 @api_router.post("/songs/{song_id}/vote")
 async def vote_song(song_id: str, vote_data: VoteRequest):
-    song = await db.song_requests.find_one({"id": song_id}, {"_id": 0})
-    if not song:
-        raise HTTPException(status_code=404, detail="Song not found")
-    
-    votes = song.get("votes")
-    voted_by = song.get('voted_by', [])
+    session_id = {"$literal": vote_data.session_id}
+    already_voted = {"$in": [session_id, {"$ifNull": ["$voted_by", []]}]}
 
-    if vote_data.session_id in voted_by:
-        await db.song_requests.update_one(
-            {"id": song_id},
-            {
-                "$set": { "votes": votes - 1 },
-                "$pull": { "voted_by": vote_data.session_id }
-            }
-        )
-    else:
-        await db.song_requests.update_one(
-            {"id": song_id},
-            {
-                "$inc": {"votes": votes + 1},
-                "$push": {"voted_by": vote_data.session_id}
+    # Toggle the vote in a single atomic pipeline update
+    updated_song = await db.song_requests.find_one_and_update(
+        {"id": song_id},
+        [{
+            "$set": {
+                "votes": {
+                    "$cond": [already_voted, {"$subtract": ["$votes", 1]}, {"$add": ["$votes", 1]}]
+                },
+                "voted_by": {
+                    "$cond": [
+                        already_voted,
+                        {"$filter": {"input": "$voted_by", "cond": {"$ne": ["$$this", session_id]}}},
+                        {"$concatArrays": [{"$ifNull": ["$voted_by", []]}, [session_id]]}
+                    ]
+                }
             }
-        )
-    
-    updated_song = await db.song_requests.find_one({"id": song_id}, {"_id": 0})
+        }],
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_song:
+        raise HTTPException(status_code=404, detail="Song not found")
     
-    room = await db.rooms.find_one({"id": song['room_id']}, {"_id": 0})
+    room = await db.rooms.find_one({"id": updated_song['room_id']}, {"_id": 0, "pin": 1})
 
     if room:
-        await manager.broadcast(room['pin'], {
+        coalescer.post(room['pin'], song_id, {
             "type": "song_voted",
             "song": updated_song
         })
@@ -244,13 +421,13 @@ async def vote_song(song_id: str, vote_data: VoteRequest):
 async def update_song_status(
     song_id: str,
     status_data: StatusUpdate,
-    current_user: User = Depends(get_current_user)
+    current_user: CurrentUser = Depends(get_current_user)
 ):
-    song = await db.song_requests.find_one({"id": song_id}, {"_id": 0})
+    song = await db.song_requests.find_one({"id": song_id}, {"_id": 0, "room_id": 1})
     if not song:
         raise HTTPException(status_code=404, detail="Song not found")
     
-    room = await db.rooms.find_one({"id": song['room_id']}, {"_id": 0})
+    room = await db.rooms.find_one({"id": song['room_id']}, {"_id": 0, "dj_id": 1, "pin": 1})
     if not room or room['dj_id'] != current_user.id:
         raise HTTPException(status_code=403, detail="Only the DJ can update song status")
     
@@ -274,12 +451,20 @@ async def get_room_songs(pin: str):
     if not room:
         raise HTTPException(status_code=404, detail="Room not found or closed")
     
-    songs = await db.song_requests.find(
+    cursor = db.song_requests.find(
         {"room_id": room['id']},
         {"_id": 0}
-    ).sort("created_at", 1).to_list(1000)
+    ).sort("created_at", 1)
     
-    return {"songs": songs}
+    async def stream_songs():
+        yield b'{"songs":['
+        separator = b''
+        async for song in cursor:
+            yield separator + orjson.dumps(song)
+            separator = b','
+        yield b']}'
+    
+    return StreamingResponse(stream_songs(), media_type="application/json")
 
 @api_router.post("/rooms/{pin}/songs")
 async def request_song(pin: str, song_data: SongRequestCreate):
@@ -297,8 +482,7 @@ async def request_song(pin: str, song_data: SongRequestCreate):
         submitter_type=song_data.submitter_type
     )
     
-    doc = song_request.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc = song_request.model_dump(mode="json")
     await db.song_requests.insert_one(doc)
 
     await manager.broadcast(pin, {
@@ -310,48 +494,53 @@ async def request_song(pin: str, song_data: SongRequestCreate):
 
 @api_router.get("/songs/search")
 async def search_songs(q: str, max_results: int = 10):
+    cache_key = f"{q.lower().strip()}:{max_results}"
+    cached = await db.yt_cache.find_one({
+        "_id": cache_key,
+        "expires_at": {"$gt": datetime.now(timezone.utc)}
+    })
+    if cached:
+        return {"results": cached['results']}
+    
     try:
-        youtube = get_youtube_service()
-        request = youtube.search().list(
-            part="snippet",
-            q=q,
-            type="video",
-            maxResults=max_results,
-            videoCategoryId="10"
-        )
-        response = request.execute()
+        async with asyncio.timeout(YOUTUBE_TIMEOUT_SECONDS):
+            response = await youtube_client.get("/search", params={"q": q, "maxResults": max_results})
+            response.raise_for_status()
         
         results = []
-        for item in response.get("items", []):
-            if item["id"]["kind"] == 'youtube#channel':
-                request2 = youtube.search().list(
-                    channelId=item["id"]["channelId"],
-                    type="video",
-                    part="snippet",
-                    maxResults=max_results,
-                    videoCategoryId="10"
-                )
-                res = request2.execute()
-            else:
-                video_id = item["id"]["videoId"]
-                results.append({
-                    "video_id": video_id,
-                    "title": item["snippet"]["title"],
-                    "thumbnail": item["snippet"]["thumbnails"]["high"]["url"],
-                    "youtube_url": f"https://www.youtube.com/watch?v={video_id}"
-                })
-
-        return {"results": results}
-    except HttpError as e:
-        if "quotaExceeded" in str(e):
+        for item in response.json().get("items", []):
+            if item["id"]["kind"] != "youtube#video":
+                continue
+            video_id = item["id"]["videoId"]
+            results.append({
+                "video_id": video_id,
+                "title": item["snippet"]["title"],
+                "thumbnail": item["snippet"]["thumbnails"]["high"]["url"],
+                "youtube_url": f"https://www.youtube.com/watch?v={video_id}"
+            })
+    except httpx.HTTPStatusError as e:
+        if "quotaExceeded" in e.response.text:
             raise HTTPException(status_code=429, detail="YouTube API quota exceeded")
-        raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=400, detail=e.response.text)
+    except (TimeoutError, httpx.TimeoutException):
+        raise HTTPException(status_code=504, detail="YouTube search timed out")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
 
+    await db.yt_cache.update_one(
+        {"_id": cache_key},
+        {"$set": {
+            "results": results,
+            "expires_at": datetime.now(timezone.utc) + timedelta(hours=YOUTUBE_CACHE_TTL_HOURS)
+        }},
+        upsert=True
+    )
+    
+    return {"results": results}
+
 @api_router.post("/rooms/{pin}/close")
-async def close_room(pin: str, current_user: User = Depends(get_current_user)):
-    room = await db.rooms.find_one({"pin": pin, "active": True}, {"_id": 0})
+async def close_room(pin: str, current_user: CurrentUser = Depends(get_current_user)):
+    room = await db.rooms.find_one({"pin": pin, "active": True}, {"_id": 0, "dj_id": 1})
     if not room:
         raise HTTPException(status_code=404, detail="Room not found")
     
@@ -378,7 +567,7 @@ async def get_room(pin: str):
     return Room(**room)
 
 @api_router.post("/rooms/create")
-async def create_room(current_user: User = Depends(get_current_user)):
+async def create_room(current_user: CurrentUser = Depends(get_current_user)):
     existing_room = await db.rooms.find_one(
         {"dj_id": current_user.id, "active": True},
         {"_id": 0}
@@ -386,9 +575,19 @@ async def create_room(current_user: User = Depends(get_current_user)):
     if existing_room:
         return Room(**existing_room)
     
-    pin = generate_room_pin()
-    while await db.rooms.find_one({"pin": pin, "active": True}):
-        pin = generate_room_pin()
+    # Check a batch of candidate pins in one query and keep the first free one
+    pin = None
+    while pin is None:
+        candidates = {generate_room_pin() for _ in range(PIN_CANDIDATES)}
+        taken = {
+            room['pin'] async for room in db.rooms.find(
+                {"pin": {"$in": list(candidates)}, "active": True},
+                {"_id": 0, "pin": 1}
+            )
+        }
+        free = candidates - taken
+        if free:
+            pin = free.pop()
     
     room = Room(
         pin=pin,
@@ -396,8 +595,7 @@ async def create_room(current_user: User = Depends(get_current_user)):
         dj_email=current_user.email
     )
     
-    doc = room.model_dump()
-    doc['created_at'] = doc['created_at'].isoformat()
+    doc = room.model_dump(mode="json")
     await db.rooms.insert_one(doc)
     
     return room
@@ -415,16 +613,19 @@ async def websocket_endpoint(websocket: WebSocket, room_pin: str):
         
         while True:
             data = await websocket.receive_text()
-            message = json.loads(data)
+            try:
+                message = ws_message_adapter.validate_json(data)
+            except ValidationError:
+                continue
             
-            if message.get('type') == 'user_joined':
+            if message.type == 'user_joined':
                 await manager.broadcast(room_pin, {
                     "type": "user_joined",
-                    "user": message.get('user', 'Guest')
+                    "user": message.user
                 })
     
     except WebSocketDisconnect:
-        manager.disconnect(websocket, room_pin)
+        await manager.disconnect(websocket, room_pin)
 
 app.add_middleware(
     CORSMiddleware,